@@ -21,6 +21,9 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+# Categorical labels let downstream filters compare integer codes
+ANOMALY_DTYPE = pd.CategoricalDtype(['Normal', 'Anomaly'])
+
 class NetworkAnomalyDetector:
     def __init__(self, config_file='config.json'):
         """Initialize detector with configuration."""
@@ -54,6 +57,15 @@ class NetworkAnomalyDetector:
             # Data validation
             self._validate_data(df)
             
+            # Parse timestamps once here; the mitigation engine expects datetime64.
+            # No fixed format: generated files may carry fractional seconds or a UTC offset
+            if 'timestamp' in df.columns:
+                df['timestamp'] = pd.to_datetime(df['timestamp'])
+            
+            # Protocol analytics work on category codes; the original names are kept
+            if 'protocol' in df.columns:
+                df['protocol'] = df['protocol'].astype('category')
+            
             # Handle missing values
             df = self._handle_missing_values(df)
             
@@ -100,7 +112,7 @@ class NetworkAnomalyDetector:
             # Fit and predict
             predictions = self.model.fit_predict(df[self.config['features']])
             df['anomaly'] = predictions
-            df['anomaly'] = df['anomaly'].map({1: 'Normal', -1: 'Anomaly'})
+            df['anomaly'] = df['anomaly'].map({1: 'Normal', -1: 'Anomaly'}).astype(ANOMALY_DTYPE)
             
             # Calculate anomaly scores
             df['anomaly_score'] = self.model.score_samples(df[self.config['features']])
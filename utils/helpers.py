@@ -1,37 +1,78 @@
 import os
 import json
+import queue
+import atexit
 import logging
+import logging.handlers
+import functools
 from datetime import datetime
 
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+_LOG_FORMATTER = logging.Formatter(LOG_FORMAT)
+
+# Background listener that owns the file/console handlers once logging is set up
+_log_listener = None
+
 def setup_logging():
-    """Setup logging configuration"""
+    """Setup logging configuration (only the first call has any effect)"""
+    global _log_listener
+    # Repeated calls would otherwise stack duplicate handlers
+    if _log_listener is not None:
+        return
+    
     os.makedirs('logs', exist_ok=True)
     
-    logging.basicConfig(
-        filename=os.path.join('logs', f'security_logs_{datetime.now().strftime("%Y%m%d")}.log'),
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s'
+    file_handler = logging.FileHandler(
+        os.path.join('logs', f'security_logs_{datetime.now().strftime("%Y%m%d")}.log')
     )
+    file_handler.setFormatter(_LOG_FORMATTER)
     
     # Also log to console
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.INFO)
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-    console_handler.setFormatter(formatter)
-    logging.getLogger().addHandler(console_handler)
+    console_handler.setFormatter(_LOG_FORMATTER)
+    
+    # Callers only enqueue records; the listener thread does the actual I/O
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    
+    _log_listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler)
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
+
+@functools.lru_cache(maxsize=8)
+def _read_config(config_file, mtime_ns):
+    """Read a config file's raw bytes; cached per (path, mtime) so edits are picked up"""
+    with open(config_file, 'rb') as f:
+        return f.read()
 
 def load_config(config_file='config.json'):
-    """Load configuration from JSON file"""
+    """Load configuration from JSON file (file reads are cached until it changes)"""
     try:
-        with open(config_file, 'r') as f:
-            return json.load(f)
+        # Re-parse the cached bytes so every caller gets its own dict; this is
+        # cheaper than deep-copying a cached parse. Both parsers accept UTF-8 bytes
+        return _json_loads(_read_config(config_file, os.stat(config_file).st_mtime_ns))
     except FileNotFoundError:
         logging.error(f"Configuration file {config_file} not found!")
         raise
 
+# Directories already created by ensure_directories in this process
+_ENSURED = set()
+
 def ensure_directories():
     """Ensure all required directories exist"""
     required_dirs = ['logs', 'outputs', 'data']
     for directory in required_dirs:
+        if directory in _ENSURED:
+            continue
         os.makedirs(directory, exist_ok=True)
+        _ENSURED.add(directory)
         logging.info(f"Ensured directory exists: {directory}") 
\ No newline at end of file
@@ -4,196 +4,231 @@ from sklearn.cluster import KMeans
 import json
 import logging
 from datetime import datetime
+from types import MappingProxyType
+
+# Rules are static, so build them once and share them (read-only, all the way
+# down) across engine instances
+_MITIGATION_RULES = MappingProxyType({
+    "TRAFFIC_SPIKE": MappingProxyType({
+        "description": "Unusual spike in network traffic",
+        "recommendations": (
+            "Implement rate limiting",
+            "Enable traffic throttling",
+            "Deploy DDoS protection"
+        ),
+        "severity": "HIGH"
+    }),
+    "PROTOCOL_ANOMALY": MappingProxyType({
+        "description": "Unusual protocol behavior",
+        "recommendations": (
+            "Update firewall rules",
+            "Enable deep packet inspection",
+            "Implement protocol validation"
+        ),
+        "severity": "MEDIUM"
+    }),
+    "PATTERN_ANOMALY": MappingProxyType({
+        "description": "Unusual traffic patterns",
+        "recommendations": (
+            "Enable behavioral analysis",
+            "Update IDS signatures",
+            "Implement traffic segmentation"
+        ),
+        "severity": "MEDIUM"
+    }),
+    "DATA_EXFILTRATION": MappingProxyType({
+        "description": "Potential data exfiltration",
+        "recommendations": (
+            "Enable data loss prevention",
+            "Implement egress filtering",
+            "Monitor data transfer patterns"
+        ),
+        "severity": "HIGH"
+    })
+})
+
+_MIN_ANOMALIES = 3
+
+KNOWN_PROTOCOLS = ('TCP', 'UDP', 'HTTP', 'HTTPS', 'SSH', 'FTP')
+
+# Known protocols take codes 0-5; anything else is folded into OTHER, so any
+# code from _UNUSUAL_START upwards marks an unusual protocol
+PROTOCOL_DTYPE = pd.CategoricalDtype([*KNOWN_PROTOCOLS, 'OTHER'])
+_UNUSUAL_START = len(KNOWN_PROTOCOLS)
+_OTHER_CODE = PROTOCOL_DTYPE.categories.get_loc('OTHER')
+
+def as_protocol_codes(protocols):
+    """Return PROTOCOL_DTYPE codes for a protocol column, mapping unknown or missing values to OTHER"""
+    if not isinstance(protocols.dtype, pd.CategoricalDtype):
+        protocols = protocols.astype('category')
+    codes = protocols.cat.codes.to_numpy()
+    if protocols.dtype == PROTOCOL_DTYPE and (codes.size == 0 or codes.min() >= 0):
+        return codes
+    # Remap per category rather than per row; the trailing entry catches code -1
+    lookup = np.append(PROTOCOL_DTYPE.categories.get_indexer(protocols.cat.categories), -1)
+    lookup[lookup < 0] = _OTHER_CODE
+    return lookup[codes]
+
+def as_protocol_categorical(protocols):
+    """Convert a protocol column to PROTOCOL_DTYPE, mapping unknown or missing values to OTHER"""
+    return pd.Series(
+        pd.Categorical.from_codes(as_protocol_codes(protocols), dtype=PROTOCOL_DTYPE),
+        index=protocols.index, name=protocols.name
+    )
+
+# Recommendation payloads with their 'type' key pre-merged
+_PREBUILT = {
+    rule_type: MappingProxyType({'type': rule_type, **rule})
+    for rule_type, rule in _MITIGATION_RULES.items()
+}
+
+# Every recommendation analyze_anomalies can emit, in output order
+_CANDIDATES = (
+    _PREBUILT['TRAFFIC_SPIKE'],
+    _PREBUILT['PATTERN_ANOMALY'],
+    _PREBUILT['PROTOCOL_ANOMALY'],
+    _PREBUILT['DATA_EXFILTRATION']
+)
+
+def _window3_sums(arr):
+    """Sums over every window of 3 consecutive values, via a cumulative sum"""
+    c = np.cumsum(arr)
+    return c[2:] - np.concatenate(([0], c[:-3]))
+
+def _pattern_kernel(bytes_arr, ts_ns, wall_ns):
+    """Run the numeric pattern checks on raw float64/int64 buffers
+
+    ts_ns holds absolute epoch ticks (for gaps), wall_ns the local wall-clock
+    ticks (for hour of day); both are the same array for naive timestamps and
+    exclude missing (NaT) timestamps.
+
+    Returns (high_volume, low_volume, burst_pattern, regular_interval,
+    burst_timing, time_concentration).
+    """
+    # Traffic volume: mean and sample variance (ddof=1, as pandas' std()).
+    # The variance is taken over deviations from the mean; the raw
+    # sum-of-squares form cancels catastrophically for large byte counts
+    # Missing values are skipped, as pandas' mean()/std() do
+    missing = np.isnan(bytes_arr)
+    has_missing = bool(missing.any())
+    present = bytes_arr[~missing] if has_missing else bytes_arr
+    n = present.size
+    mu = present.sum() / n if n > 0 else np.nan
+    if n > 1:
+        d = present - mu
+        sd = np.sqrt(d @ d / (n - 1))
+    else:
+        sd = np.nan
+    high_volume = bool((bytes_arr > mu + 2*sd).any())
+    low_volume = bool((bytes_arr < mu - 2*sd).any())
+    
+    # Window-3 rolling mean from a cumulative sum, no pandas rolling machinery.
+    # Like rolling(3), only the windows that contain a missing value are dropped
+    burst_pattern = False
+    if bytes_arr.size >= 3:
+        if has_missing:
+            rolling_mean = _window3_sums(np.where(missing, 0.0, bytes_arr)) / 3.0
+            complete = _window3_sums(missing.astype(np.int64)) == 0
+            burst_pattern = bool(((rolling_mean > mu * 2) & complete).any())
+        else:
+            rolling_mean = _window3_sums(bytes_arr) / 3.0
+            burst_pattern = bool((rolling_mean > mu * 2).any())
+    
+    # Gaps between consecutive anomalies, in ns and in seconds
+    ns_diffs = np.diff(ts_ns)
+    time_diffs = ns_diffs / 1e9
+    diff_mean = time_diffs.mean() if time_diffs.size > 0 else np.nan
+    diff_std = time_diffs.std(ddof=1) if time_diffs.size > 1 else np.nan
+    regular_interval = bool(diff_std < diff_mean * 0.1)
+    burst_timing = bool((ns_diffs < 1_000_000_000).any())
+    
+    # Concentration of anomalies within a single hour of the day; the hour
+    # comes straight from the wall-clock nanoseconds rather than the .dt accessor
+    hours = (wall_ns // 3_600_000_000_000) % 24
+    # The share is taken over every anomaly, including any with a missing timestamp
+    hour_counts = np.bincount(hours, minlength=24)
+    time_concentration = bool(hour_counts.max() * 10 > 3 * bytes_arr.size)
+    
+    return high_volume, low_volume, burst_pattern, regular_interval, burst_timing, time_concentration
 
 class MitigationEngine:
     def __init__(self):
-        self.mitigation_rules = self._load_mitigation_rules()
-        
-    def _load_mitigation_rules(self):
-        """Load predefined mitigation rules"""
-        try:
-            return {
-                "TRAFFIC_SPIKE": {
-                    "description": "Unusual spike in network traffic",
-                    "recommendations": [
-                        "Implement rate limiting",
-                        "Enable traffic throttling",
-                        "Deploy DDoS protection"
-                    ],
-                    "severity": "HIGH"
-                },
-                "PROTOCOL_ANOMALY": {
-                    "description": "Unusual protocol behavior",
-                    "recommendations": [
-                        "Update firewall rules",
-                        "Enable deep packet inspection",
-                        "Implement protocol validation"
-                    ],
-                    "severity": "MEDIUM"
-                },
-                "PATTERN_ANOMALY": {
-                    "description": "Unusual traffic patterns",
-                    "recommendations": [
-                        "Enable behavioral analysis",
-                        "Update IDS signatures",
-                        "Implement traffic segmentation"
-                    ],
-                    "severity": "MEDIUM"
-                },
-                "DATA_EXFILTRATION": {
-                    "description": "Potential data exfiltration",
-                    "recommendations": [
-                        "Enable data loss prevention",
-                        "Implement egress filtering",
-                        "Monitor data transfer patterns"
-                    ],
-                    "severity": "HIGH"
-                }
-            }
-        except Exception as e:
-            logging.error(f"Error loading mitigation rules: {str(e)}")
-            raise
+        self.mitigation_rules = _MITIGATION_RULES
 
     def analyze_anomalies(self, df):
         """Analyze anomalies and generate mitigation recommendations"""
         try:
-            anomalies_df = df[df['anomaly'] == 'Anomaly'].copy()
+            # Timestamps are parsed once at ingest, never re-parsed here
+            if not pd.api.types.is_datetime64_any_dtype(df['timestamp']):
+                raise ValueError("timestamp column must be datetime64; parse it once at ingest")
             
-            if len(anomalies_df) == 0:
+            # Filter on integer category codes when available. Boolean indexing
+            # already yields a new frame, so no extra .copy() is taken
+            anomaly = df['anomaly']
+            if isinstance(anomaly.dtype, pd.CategoricalDtype):
+                if 'Anomaly' not in anomaly.cat.categories:
+                    return []
+                mask = anomaly.cat.codes.to_numpy() == anomaly.cat.categories.get_loc('Anomaly')
+            else:
+                mask = anomaly.to_numpy() == 'Anomaly'
+            anomalies_df = df[mask]
+            
+            # Too few anomalies to establish a pattern (bursts need a window of 3)
+            if len(anomalies_df) < _MIN_ANOMALIES:
                 return []
                 
-            recommendations = []
-            
-            # Analyze traffic patterns
-            traffic_patterns = self._analyze_traffic_patterns(anomalies_df)
-            protocol_patterns = self._analyze_protocol_patterns(anomalies_df)
-            temporal_patterns = self._analyze_temporal_patterns(anomalies_df)
-            
-            # Generate recommendations based on patterns
-            recommendations.extend(self._generate_traffic_recommendations(traffic_patterns))
-            recommendations.extend(self._generate_protocol_recommendations(protocol_patterns))
-            recommendations.extend(self._generate_temporal_recommendations(temporal_patterns))
-            
-            return recommendations
+            patterns = self._analyze_all(anomalies_df)
+            return self._generate_all_recommendations(patterns)
             
         except Exception as e:
             logging.error(f"Error in analyze_anomalies: {str(e)}")
             raise
 
-    def _analyze_traffic_patterns(self, df):
-        """Analyze traffic patterns in anomalies"""
-        try:
-            patterns = {
-                'high_volume': len(df[df['bytes_transferred'] > df['bytes_transferred'].mean() + 2*df['bytes_transferred'].std()]) > 0,
-                'low_volume': len(df[df['bytes_transferred'] < df['bytes_transferred'].mean() - 2*df['bytes_transferred'].std()]) > 0,
-                'burst_pattern': self._detect_burst_pattern(df)
-            }
-            return patterns
-        except Exception as e:
-            logging.error(f"Error in analyze_traffic_patterns: {str(e)}")
-            raise
+    def _analyze_all(self, df):
+        """Analyze traffic, protocol and temporal patterns in a single pass"""
+        # Pull each column out once and work on the raw buffers from here on
+        bytes_arr = df['bytes_transferred'].to_numpy(dtype=np.float64, copy=False)
+        protocols = df['protocol']
+        timestamps = df['timestamp']
+        # Reinterpret datetime64[ns] as int64 ticks; NaT would read as INT64_MIN,
+        # so missing timestamps are dropped first
+        ts = timestamps.to_numpy(dtype='datetime64[ns]')
+        valid = ~np.isnat(ts)
+        ts_ns = ts[valid].view(np.int64)
+        wall_ns = ts_ns
+        if timestamps.dt.tz is not None:
+            # Hours of day are bucketed in local time, as .dt.hour would
+            wall_ns = timestamps.dt.tz_localize(None).to_numpy(dtype='datetime64[ns]')[valid].view(np.int64)
         
-    def _analyze_protocol_patterns(self, df):
-        """Analyze protocol distribution in anomalies"""
-        try:
-            protocol_dist = df['protocol'].value_counts(normalize=True)
-            patterns = {
-                'protocol_dominance': any(protocol_dist > 0.7),
-                'protocol_diversity': len(protocol_dist) > 2,
-                'unusual_protocols': set(df['protocol']) - {'TCP', 'UDP', 'HTTP', 'HTTPS', 'SSH', 'FTP'}
-            }
-            return patterns
-        except Exception as e:
-            logging.error(f"Error in analyze_protocol_patterns: {str(e)}")
-            raise
+        (high_volume, low_volume, burst_pattern,
+         regular_interval, burst_timing, time_concentration) = _pattern_kernel(bytes_arr, ts_ns, wall_ns)
         
-    def _analyze_temporal_patterns(self, df):
-        """Analyze temporal patterns in anomalies"""
-        try:
-            df = df.copy()
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            time_diffs = df['timestamp'].diff().dt.total_seconds()
-            patterns = {
-                'regular_interval': time_diffs.std() < time_diffs.mean() * 0.1,
-                'burst_timing': any(time_diffs < 1),
-                'time_concentration': self._detect_time_concentration(df)
-            }
-            return patterns
-        except Exception as e:
-            logging.error(f"Error in analyze_temporal_patterns: {str(e)}")
-            raise
-
-    def _detect_burst_pattern(self, df):
-        """Detect burst patterns in traffic"""
-        try:
-            if len(df) < 3:
-                return False
-            rolling_mean = df['bytes_transferred'].rolling(window=3).mean()
-            return any(rolling_mean > df['bytes_transferred'].mean() * 2)
-        except Exception as e:
-            logging.error(f"Error in detect_burst_pattern: {str(e)}")
-            raise
-
-    def _detect_time_concentration(self, df):
-        """Detect concentration of anomalies in time periods"""
-        try:
-            df['hour'] = df['timestamp'].dt.hour
-            hour_counts = df['hour'].value_counts()
-            return any(hour_counts > len(df) * 0.3)
-        except Exception as e:
-            logging.error(f"Error in detect_time_concentration: {str(e)}")
-            raise
-
-    def _generate_traffic_recommendations(self, patterns):
-        """Generate recommendations based on traffic patterns"""
-        try:
-            recommendations = []
-            
-            if patterns['high_volume']:
-                recommendations.append({
-                    'type': 'TRAFFIC_SPIKE',
-                    **self.mitigation_rules['TRAFFIC_SPIKE']
-                })
-                
-            if patterns['burst_pattern']:
-                recommendations.append({
-                    'type': 'PATTERN_ANOMALY',
-                    **self.mitigation_rules['PATTERN_ANOMALY']
-                })
-                
-            return recommendations
-        except Exception as e:
-            logging.error(f"Error in generate_traffic_recommendations: {str(e)}")
-            raise
-
-    def _generate_protocol_recommendations(self, patterns):
-        """Generate recommendations based on protocol patterns"""
-        try:
-            recommendations = []
-            
-            if patterns['protocol_dominance'] or patterns['unusual_protocols']:
-                recommendations.append({
-                    'type': 'PROTOCOL_ANOMALY',
-                    **self.mitigation_rules['PROTOCOL_ANOMALY']
-                })
-                
-            return recommendations
-        except Exception as e:
-            logging.error(f"Error in generate_protocol_recommendations: {str(e)}")
-            raise
+        # Protocol distribution; dominance is an integer-only share check.
+        # Codes are folded onto PROTOCOL_DTYPE locally, so the caller's column
+        # keeps its real names, and missing values count as OTHER
+        codes = as_protocol_codes(protocols)
+        protocol_counts = np.bincount(codes, minlength=len(PROTOCOL_DTYPE.categories))
+        
+        patterns = {
+            'high_volume': high_volume,
+            'low_volume': low_volume,
+            'burst_pattern': burst_pattern,
+            'protocol_dominance': bool(protocol_counts.max() * 10 > 7 * protocol_counts.sum()),
+            'protocol_diversity': np.count_nonzero(protocol_counts) > 2,
+            'unusual_protocols': bool(protocol_counts[_UNUSUAL_START:].any()),
+            'regular_interval': regular_interval,
+            'burst_timing': burst_timing,
+            'time_concentration': time_concentration
+        }
+        return patterns
 
-    def _generate_temporal_recommendations(self, patterns):
-        """Generate recommendations based on temporal patterns"""
-        try:
-            recommendations = []
-            
-            if patterns['regular_interval'] or patterns['time_concentration']:
-                recommendations.append({
-                    'type': 'DATA_EXFILTRATION',
-                    **self.mitigation_rules['DATA_EXFILTRATION']
-                })
-                
-            return recommendations
-        except Exception as e:
-            logging.error(f"Error in generate_temporal_recommendations: {str(e)}")
-            raise 
\ No newline at end of file
+    def _generate_all_recommendations(self, patterns):
+        """Generate recommendations based on the combined patterns"""
+        # One flag per entry of _CANDIDATES, in the same order
+        flags = (
+            patterns['high_volume'],
+            patterns['burst_pattern'],
+            patterns['protocol_dominance'] or patterns['unusual_protocols'],
+            patterns['regular_interval'] or patterns['time_concentration']
+        )
+        return [dict(candidate) for candidate, flag in zip(_CANDIDATES, flags) if flag]